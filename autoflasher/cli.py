@@ -0,0 +1,50 @@
+# cli.py
+import argparse
+import json
+import sys
+
+from .main import APP_ROOT
+
+
+def build_vm():
+    """Construct the ViewModel directly; never touches Tk."""
+    from .viewmodels.flasher_vm import AutoFlasherViewModel
+    return AutoFlasherViewModel(APP_ROOT)
+
+
+def cli(argv=None) -> int:
+    """Headless one-shot flash: python -m autoflasher.cli --folder X --target IO"""
+    parser = argparse.ArgumentParser(
+        prog="autoflasher", description="Flash a device without the GUI."
+    )
+    parser.add_argument("--folder", required=True, help="firmware folder under firmware_root")
+    parser.add_argument("--target", required=True, help="target board (IO, Delsys, Logo)")
+    parser.add_argument("--json-log", action="store_true", help="emit the result as JSON on stdout")
+    parser.add_argument("--force", action="store_true",
+                        help="flash even if this image already flashed successfully")
+    args = parser.parse_args(argv)
+
+    vm = build_vm()
+    results = []
+    if not args.json_log:
+        vm.on_status = lambda msg, is_error=False: print(
+            msg, file=sys.stderr if is_error else sys.stdout
+        )
+    vm.on_completed = results.append
+    vm.flash_sync(args.folder, args.target, force=args.force)
+
+    # FlashOutcome.__bool__ mirrors .success, so a failed outcome is falsy;
+    # compare against None or failure details would be dropped from the JSON.
+    outcome = results[-1] if results else None
+    success = outcome is not None and outcome.success
+    if args.json_log:
+        print(json.dumps({
+            "success": success,
+            "errors": list(outcome.errors) if outcome is not None else ["No completion event."],
+            "warnings": list(outcome.warnings) if outcome is not None else [],
+        }))
+    return 0 if success else 1
+
+
+if __name__ == "__main__":
+    sys.exit(cli())
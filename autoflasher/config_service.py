@@ -2,6 +2,9 @@
 import os
 import platform
 import json
+import logging
+
+logger = logging.getLogger("autoflasher.config")
 
 JLINK_WINDOWS = "JLink.exe"
 JLINK_UNIX = "JLinkExe"
@@ -9,9 +12,12 @@ JLINK_DEFAULT_INTERFACE = "SWD"
 JLINK_DEFAULT_SPEED = 4000
 CONFIG_FILENAME = "config.json"
 
+# The OS doesn't change at runtime; decide the default once at import
+_DEFAULT_JLINK = JLINK_WINDOWS if platform.system() == "Windows" else JLINK_UNIX
+
 def get_default_config() -> dict:
     return {
-        "jlink_path": JLINK_WINDOWS if platform.system() == "Windows" else JLINK_UNIX,
+        "jlink_path": _DEFAULT_JLINK,
         "jlink_interface": JLINK_DEFAULT_INTERFACE,
         "jlink_speed": JLINK_DEFAULT_SPEED,
         # Optional user-set defaults:
@@ -20,17 +26,30 @@ def get_default_config() -> dict:
         "firmware_root": "firmware",
     }
 
+# Parsed config.json keyed by path -> (st_mtime_ns, file config); avoids
+# re-reading and re-parsing JSON when the file hasn't changed.
+_CACHE = {}
+
 def load_config(base_dir: str) -> dict:
     """Load config.json from base_dir; merge with defaults."""
     config = get_default_config()
     path = os.path.join(base_dir, CONFIG_FILENAME)
-    if os.path.exists(path):
-        try:
-            with open(path, "r", encoding="utf-8") as f:
-                file_cfg = json.load(f)
-            config.update(file_cfg or {})
-        except Exception as e:
-            print(f"[config] Warning: failed to load config.json ({e}); using defaults.")
+    try:
+        mtime = os.stat(path).st_mtime_ns
+    except OSError:
+        return config
+    cached = _CACHE.get(path)
+    if cached is not None and cached[0] == mtime:
+        config.update(cached[1])
+        return config
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            file_cfg = json.load(f) or {}
+    except Exception as e:
+        logger.warning("Failed to load config.json (%s); using defaults.", e)
+        return config
+    _CACHE[path] = (mtime, file_cfg)
+    config.update(file_cfg)
     return config
 
 def save_config(base_dir: str, cfg: dict) -> None:
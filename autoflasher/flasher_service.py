@@ -1,16 +1,18 @@
 # flasher_service.py
+import asyncio
+import atexit
+import hashlib
+import json
+import mmap
 import os
+import queue
 import re
+import shutil
 import tempfile
 import subprocess
-from typing import List, Optional
-
-from autoflasher.jlink_commands import (
-    DeviceCommand, InterfaceCommand, SpeedCommand,
-    ConnectCommand, UnlockKinetisCommand, ResetCommand, EraseCommand,
-    WriteRegisterCommand, SleepCommand, LoadFileCommand, CommentCommand,
-    GoCommand, ExitCommand
-)
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from typing import Callable, Dict, List, Optional, Tuple
 
 DEVICE_LINES = {
     "IO": "Device K32L3Axxxxxxxx_M4",
@@ -20,20 +22,113 @@ DEVICE_LINES = {
 
 DEFAULT_FIRMWARE_EXTS = (".axf", ".elf", ".bin", ".hex", ".s19", ".srec")
 
+# Error markers in J-Link Commander output. The fatal set guarantees the
+# flash failed (connection/RAMCode/voltage problems), so analysis can stop at
+# the first hit instead of scanning the rest of the log; the generic set is
+# collected exhaustively. Compiled once as a single alternation so
+# analyze_output sweeps the log in one pass instead of once per pattern.
+_FATAL_PATTERNS = [
+    r"Target voltage too low",
+    r"Could not connect to the target device",
+    r"Failed to prepare for programming",
+    r"Failed to download RAMCode",
+    r"Verification of RAMCode failed",
+    r"Cannot connect",
+    r"Connection failed",
+    r"Cannot identify target",
+]
+_GENERIC_ERROR_PATTERNS = [
+    r"Error occurred:.*",
+    r"Unspecified error\b",
+    r"J-Link.*error",
+    r"Error:",
+]
+# All analyze_output markers fused into one alternation so classification is a
+# single linear sweep over the log instead of one scan per marker.
+_ANALYZE_RE = re.compile(
+    "(?P<fatal>" + "|".join([f"(?:{p})" for p in _FATAL_PATTERNS]) + ")"
+    "|(?P<err>" + "|".join([f"(?:{p})" for p in _GENERIC_ERROR_PATTERNS]) + ")"
+    r"|(?P<load>loadfile)"
+    r"|(?P<ok>O\.K\.)"
+    r"|(?P<prog>Program\s*&\s*Verify|Program speed)",
+    re.IGNORECASE,
+)
 
+
+@dataclass(slots=True)
 class FlashOutcome:
-    """Result of a flash attempt: success flag, errors/warnings, and the raw J-Link output."""
-    def __init__(self, success: bool, errors: Optional[List[str]] = None,
-                 warnings: Optional[List[str]] = None, raw_output: str = ""):
-        self.success = success
-        self.errors = errors or []
-        self.warnings = warnings or []
-        self.raw_output = raw_output
+    """Result of a flash attempt: success flag, errors/warnings, and the raw J-Link output.
+
+    cached is True when the flash was skipped because the same image was
+    already programmed successfully (see FlasherService.is_flash_cached).
+    """
+    success: bool
+    errors: Optional[List[str]] = None
+    warnings: Optional[List[str]] = None
+    raw_output: str = ""
+    cached: bool = False
+
+    def __post_init__(self):
+        # Callers may pass None for the list fields; normalize once here
+        self.errors = self.errors or []
+        self.warnings = self.warnings or []
 
     def __bool__(self):
         return self.success
 
 
+class OutputAnalyzer:
+    """
+    Incremental counterpart of FlasherService.analyze_output: feed output
+    lines as they arrive and read the verdict at the end, so streaming
+    callers never re-scan the accumulated log.
+    """
+
+    def __init__(self) -> None:
+        self.errors: List[str] = []
+        self.fatal: Optional[str] = None
+        self.saw_load = False
+        self.saw_ok = False
+        self.saw_prog = False
+        self._lines: List[str] = []
+
+    def feed(self, line: str) -> None:
+        self._lines.append(line)
+        if self.fatal is not None:
+            return  # verdict is sealed; keep the raw log but skip matching
+        for m in _ANALYZE_RE.finditer(line):
+            if m.lastgroup == "fatal":
+                self.fatal = m.group("fatal")
+                return
+            if m.lastgroup == "err":
+                self.errors.append(m.group("err"))
+            elif m.lastgroup == "load":
+                self.saw_load = True
+            elif m.lastgroup == "ok":
+                self.saw_ok = True
+            else:
+                self.saw_prog = True
+
+    @property
+    def text(self) -> str:
+        return "".join(self._lines)
+
+    def outcome(self) -> FlashOutcome:
+        text = self.text
+        if not text.strip():
+            return FlashOutcome(False, ["No output from J-Link."], [], "")
+        if self.fatal is not None:
+            return FlashOutcome(False, [self.fatal], [], text)
+        if self.errors:
+            # Dedup repeated markers, preserving first-seen order
+            return FlashOutcome(False, list(dict.fromkeys(self.errors)), [], text)
+        if not self.saw_load:
+            return FlashOutcome(False, ["No 'loadfile' found in output."], [], text)
+        if self.saw_ok or self.saw_prog:
+            return FlashOutcome(True, [], [], text)
+        return FlashOutcome(False, ["No success marker ('O.K.') found in output."], [], text)
+
+
 class FlasherService:
     def __init__(
         self,
@@ -49,98 +144,345 @@ class FlasherService:
         self.interface = interface
         self.speed_khz = int(speed_khz)
 
+        self.firmware_root = self._resolve_firmware_root(firmware_root)
+
+        self.allowed_exts = tuple((allowed_exts or DEFAULT_FIRMWARE_EXTS))
+        # Case-folded once here so the per-entry match below doesn't re-fold;
+        # the frozenset gives O(1) membership regardless of how many
+        # extensions the user configures.
+        self.allowed_exts_cf = tuple(e.casefold() for e in self.allowed_exts)
+        self._ext_set = frozenset(self.allowed_exts_cf)
+        os.makedirs(self.firmware_root, exist_ok=True)
+
+        # One persistent script file per service; rewritten on each flash so we
+        # don't pay open/unlink churn per call. Parallel runs draw extra paths
+        # from a small reusable pool.
+        self._script_path = self._new_script_path()
+        self._script_pool: "queue.Queue[str]" = queue.Queue()
+
+        # Directory listings keyed by path -> (st_mtime_ns, entries), so GUI
+        # refreshes don't re-stat an unchanged firmware tree.
+        self._listdir_cache: Dict[str, Tuple[int, List[os.DirEntry]]] = {}
+        # Filtered folder names for the current firmware_root listing
+        self._folders_cache: Optional[Tuple[List[os.DirEntry], List[str]]] = None
+
+        # Digests of the last successfully flashed image, keyed by
+        # "TARGET/folder" and persisted next to config.json so re-flashing an
+        # unchanged binary can skip the J-Link spawn entirely.
+        self._flash_cache_path = os.path.join(base_dir, "flash_cache.json")
+        self._flash_cache: Optional[Dict[str, str]] = None
+
+        self._rebuild_script_parts()
+        self._resolve_jlink_argv()
+
+    def _resolve_jlink_argv(self) -> None:
+        """Resolve the J-Link binary through PATH once so each run skips the
+        search, and suppress the console window it would open on Windows."""
+        self._jlink_abs = shutil.which(self.jlink_path) or self.jlink_path
+        self._argv_prefix = [self._jlink_abs, "-CommandFile"]
+        self._creationflags = subprocess.CREATE_NO_WINDOW if os.name == "nt" else 0
+
+    @staticmethod
+    def _resolve_firmware_root(firmware_root: str) -> str:
         # Project root is one level up from package dir
         package_dir = os.path.dirname(os.path.abspath(__file__))
         project_root = os.path.dirname(package_dir)
         if os.path.isabs(firmware_root):
-            self.firmware_root = firmware_root
-        else:
-            self.firmware_root = os.path.join(project_root, firmware_root or "firmware")
+            return firmware_root
+        return os.path.join(project_root, firmware_root or "firmware")
 
-        self.allowed_exts = tuple((allowed_exts or DEFAULT_FIRMWARE_EXTS))
-        os.makedirs(self.firmware_root, exist_ok=True)
+    def update(
+        self,
+        *,
+        jlink_path: Optional[str] = None,
+        interface: Optional[str] = None,
+        speed_khz: Optional[int] = None,
+        firmware_root: Optional[str] = None,
+        allowed_exts: Optional[List[str]] = None,
+    ) -> None:
+        """
+        Rebind settings in place instead of rebuilding the service, so config
+        saves don't throw away the script-file pool or directory caches. The
+        listing cache is only dropped when firmware_root actually changes.
+        """
+        if jlink_path is not None:
+            self.jlink_path = jlink_path
+            self._resolve_jlink_argv()
+        if interface is not None:
+            self.interface = interface
+        if speed_khz is not None:
+            self.speed_khz = int(speed_khz)
+        if interface is not None or speed_khz is not None:
+            self._rebuild_script_parts()
+        if firmware_root is not None:
+            new_root = self._resolve_firmware_root(firmware_root)
+            if new_root != self.firmware_root:
+                self.firmware_root = new_root
+                os.makedirs(self.firmware_root, exist_ok=True)
+                self.invalidate_listing_cache()
+        if allowed_exts is not None:
+            self.allowed_exts = tuple(allowed_exts or DEFAULT_FIRMWARE_EXTS)
+            self.allowed_exts_cf = tuple(e.casefold() for e in self.allowed_exts)
+            self._ext_set = frozenset(self.allowed_exts_cf)
+
+    @staticmethod
+    def _new_script_path() -> str:
+        with tempfile.NamedTemporaryFile(delete=False, suffix=".jlink", mode="w") as f:
+            path = f.name
+        atexit.register(FlasherService._remove_quiet, path)
+        return path
+
+    @staticmethod
+    def _remove_quiet(path: str) -> None:
+        try:
+            os.remove(path)
+        except Exception:
+            pass
+
+    # Folder names that are never firmware releases
+    _BAD_DIRS = frozenset(
+        {"__pycache__", ".git", ".vscode", ".idea", "venv", "env", ".pytest_cache", "dist", "build"}
+    )
 
-    def _is_valid_folder_name(self, name: str) -> bool:
-        bad = {"__pycache__", ".git", ".vscode", ".idea", "venv", "env", ".pytest_cache", "dist", "build"}
-        if not name:
-            return False
-        if name in bad or name.startswith(".") or name.startswith("_"):
-            return False
-        return True
+    def _scandir_cached(self, path: str) -> List[os.DirEntry]:
+        """Return os.scandir entries for path, re-reading only when its mtime changed."""
+        mtime = os.stat(path).st_mtime_ns
+        cached = self._listdir_cache.get(path)
+        if cached is not None and cached[0] == mtime:
+            return cached[1]
+        entries = list(os.scandir(path))
+        self._listdir_cache[path] = (mtime, entries)
+        return entries
+
+    def invalidate_listing_cache(self) -> None:
+        """Drop cached directory listings (e.g. after firmware_root changes)."""
+        self._listdir_cache.clear()
+        self._folders_cache = None
 
     def list_local_folders(self) -> List[str]:
         try:
-            entries = os.listdir(self.firmware_root)
+            entries = self._scandir_cached(self.firmware_root)
         except FileNotFoundError:
             return []
-        return [
-            n
-            for n in entries
-            if self._is_valid_folder_name(n) and os.path.isdir(os.path.join(self.firmware_root, n))
+        cached = self._folders_cache
+        if cached is not None and cached[0] is entries:
+            return cached[1]
+        bad = self._BAD_DIRS
+        names = [
+            e.name
+            for e in entries
+            if e.name not in bad
+            and not e.name.startswith((".", "_"))
+            and e.is_dir()  # follow symlinks: linked release folders count
         ]
+        self._folders_cache = (entries, names)
+        return names
 
     def find_firmware_file(self, folder: str, search_tag: str) -> Optional[str]:
         folder_path = os.path.join(self.firmware_root, folder)
+        search_tag_cf = search_tag.casefold()
         try:
-            for name in os.listdir(folder_path):
-                lower = name.lower()
-                if search_tag in lower and lower.endswith(self.allowed_exts):
-                    return os.path.join(folder_path, name)
+            for entry in self._scandir_cached(folder_path):
+                name_cf = entry.name.casefold()
+                if (
+                    search_tag_cf in name_cf
+                    and os.path.splitext(name_cf)[1] in self._ext_set
+                    and entry.is_file()  # follow symlinks: linked images count
+                ):
+                    return entry.path
         except FileNotFoundError:
             return None
         return None
 
+    # ----- flash-skip cache -----
+    @staticmethod
+    def file_digest(path: str) -> str:
+        """SHA-256 hex digest of a firmware file.
+
+        The file is memory-mapped and hashed in one update so no Python-side
+        chunk buffers are allocated; the kernel pages the image in on demand.
+        """
+        h = hashlib.sha256()
+        with open(path, "rb") as f:
+            size = os.fstat(f.fileno()).st_size
+            if size:  # mmap rejects zero-length maps
+                with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+                    h.update(mm)
+        return h.hexdigest()
+
+    def _load_flash_cache(self) -> Dict[str, str]:
+        if self._flash_cache is None:
+            try:
+                with open(self._flash_cache_path, "r", encoding="utf-8") as f:
+                    data = json.load(f)
+                self._flash_cache = data if isinstance(data, dict) else {}
+            except Exception:
+                self._flash_cache = {}
+        return self._flash_cache
+
+    @staticmethod
+    def _flash_cache_key(target: str, folder: str) -> str:
+        return f"{target.upper()}/{folder}"
+
+    def is_flash_cached(self, target: str, folder: str, digest: str) -> bool:
+        """True if this exact image was already flashed successfully for (target, folder)."""
+        return self._load_flash_cache().get(self._flash_cache_key(target, folder)) == digest
+
+    def record_flash(self, target: str, folder: str, digest: str) -> None:
+        """Remember a verified successful flash; call only after success."""
+        cache = self._load_flash_cache()
+        cache[self._flash_cache_key(target, folder)] = digest
+        try:
+            with open(self._flash_cache_path, "w", encoding="utf-8") as f:
+                json.dump(cache, f, indent=2)
+        except Exception:
+            pass  # cache is an optimization; never fail a flash over it
+
     def get_device_line(self, target: str) -> str:
         return DEVICE_LINES.get(target.upper(), DEVICE_LINES["IO"])
 
-    def build_script(self, target: str, firmware_file: str) -> str:
-        is_io = target.upper() == "IO"
-        cmds = [
-            DeviceCommand(self.get_device_line(target)),
-            InterfaceCommand(self.interface),
-            SpeedCommand(self.speed_khz),
-            ConnectCommand(),
-            UnlockKinetisCommand(),
-            ResetCommand(),
-            EraseCommand(),
-            WriteRegisterCommand(4, 0x40023004, 0x44000000),
-            WriteRegisterCommand(1, 0x40023000, 0x70),
-            WriteRegisterCommand(1, 0x40023000, 0x80),
-            SleepCommand(5),
-            LoadFileCommand(firmware_file),
-        ]
-        if is_io:
-            cmds += [
-                CommentCommand("Program IFR FOPT field (IO only)"),
-                WriteRegisterCommand(4, 0x40023004, 0x43840000),
-                WriteRegisterCommand(4, 0x40023008, 0xFFFFF3FF),
-                WriteRegisterCommand(1, 0x40023000, 0x70),
-                WriteRegisterCommand(1, 0x40023000, 0x80),
-                SleepCommand(5),
-            ]
-        cmds += [
-            ResetCommand(), 
-            GoCommand(), 
-            ExitCommand()
-            ]  
-        return "\n".join(c.render() for c in cmds)
-
-    def run_script(self, script_text: str) -> str:
-        """Executes the J-Link Commander script and returns its combined stdout/stderr."""
-        with tempfile.NamedTemporaryFile(delete=False, suffix=".jlink", mode="w", encoding="utf-8") as f:
+    # Static command lines shared by every script (pre-rendered once; only the
+    # device/interface/speed/loadfile lines vary per flash).
+    _SCRIPT_BODY = (
+        "connect",
+        "unlock kinetis",
+        "r",
+        "erase",
+        "w4 0x40023004, 0x44000000",
+        "w1 0x40023000, 0x00000070",
+        "w1 0x40023000, 0x00000080",
+        "Sleep 5",
+    )
+    _SCRIPT_IO_BLOCK = (
+        "// Program IFR FOPT field (IO only)",
+        "w4 0x40023004, 0x43840000",
+        "w4 0x40023008, 0xFFFFF3FF",
+        "w1 0x40023000, 0x00000070",
+        "w1 0x40023000, 0x00000080",
+        "Sleep 5",
+    )
+    _SCRIPT_SUFFIX = ("r", "g", "exit")
+
+    def _rebuild_script_parts(self) -> None:
+        """Pre-join the interface/speed-dependent script sections so
+        build_script is a couple of f-string insertions, not a full join."""
+        self._script_setup = "\n".join(
+            (f"IF {self.interface}", f"Speed {self.speed_khz}") + self._SCRIPT_BODY
+        )
+        self._script_suffix_io = "\n" + "\n".join(self._SCRIPT_IO_BLOCK + self._SCRIPT_SUFFIX)
+        self._script_suffix = "\n" + "\n".join(self._SCRIPT_SUFFIX)
+
+    def build_script(self, target: str, firmware_file: str, emu_serial: Optional[str] = None) -> str:
+        # Bind the script to a specific probe so parallel runs don't race
+        head = f"SelectEmuBySN {emu_serial}\n" if emu_serial else ""
+        suffix = self._script_suffix_io if target.upper() == "IO" else self._script_suffix
+        return (
+            f"{head}{self.get_device_line(target)}\n{self._script_setup}\n"
+            f'loadfile "{firmware_file}" 0x0{suffix}'
+        )
+
+    def run_script(self, script_text: str, on_line: Optional[Callable[[str], None]] = None) -> str:
+        """
+        Executes the J-Link Commander script and returns its combined
+        stdout/stderr. If on_line is given it is called with each output line
+        as it arrives, so callers can show live progress instead of waiting
+        for the whole log.
+        """
+        buf: List[str] = []
+        for line in self.iter_script_output(script_text):
+            if on_line:
+                on_line(line)
+            buf.append(line)
+        return "".join(buf)
+
+    def iter_script_output(self, script_text: str):
+        """Run the script and yield J-Link output lines as they are produced."""
+        with open(self._script_path, "w", encoding="utf-8") as f:
             f.write(script_text)
-            script_path = f.name
+        proc = subprocess.Popen(
+            self._argv_prefix + [self._script_path],
+            stdout=subprocess.PIPE, stderr=subprocess.STDOUT,
+            text=True, bufsize=1, creationflags=self._creationflags,
+        )
         try:
-            proc = subprocess.run(
-                [self.jlink_path, "-CommandFile", script_path],
-                capture_output=True, text=True, shell=True
+            for line in proc.stdout:
+                yield line
+        finally:
+            proc.wait()
+
+    async def run_script_async(
+        self,
+        script_text: str,
+        emu_serial: Optional[str] = None,
+        on_line: Optional[Callable[[str], None]] = None,
+    ) -> str:
+        """
+        Async variant of run_script for event-loop callers. Output is read
+        line-by-line (with on_line called per line, like run_script) and each
+        call draws a script path from the reusable pool so concurrent
+        coroutines never share a file.
+        """
+        try:
+            script_path = self._script_pool.get_nowait()
+        except queue.Empty:
+            script_path = self._new_script_path()
+        try:
+            with open(script_path, "w", encoding="utf-8") as f:
+                f.write(script_text)
+            argv = self._argv_prefix + [script_path]
+            if emu_serial:
+                argv += ["-SelectEmuBySN", str(emu_serial)]
+            proc = await asyncio.create_subprocess_exec(
+                *argv,
+                stdout=asyncio.subprocess.PIPE, stderr=asyncio.subprocess.STDOUT,
+                creationflags=self._creationflags,
             )
-            return (proc.stdout or "") + (proc.stderr or "")
+            buf: List[str] = []
+            while True:
+                raw = await proc.stdout.readline()
+                if not raw:
+                    break
+                line = raw.decode(errors="replace")
+                if on_line:
+                    on_line(line)
+                buf.append(line)
+            await proc.wait()
+            return "".join(buf)
         finally:
+            self._script_pool.put(script_path)
+
+    def run_scripts_parallel(self, jobs: List[Tuple[str, str]]) -> List[str]:
+        """
+        Run several J-Link Commander scripts at once, one per probe.
+        `jobs` is a list of (script_text, emu_serial) pairs; each invocation is
+        pinned to its probe via -SelectEmuBySN so they can't race each other.
+        Returns the combined output per job, in job order. Each job just waits
+        on J-Link I/O, so one thread per job is the right amount of fan-out.
+        """
+        if not jobs:
+            return []
+
+        def _run_one(job: Tuple[str, str]) -> str:
+            script_text, emu_serial = job
             try:
-                os.remove(script_path)
-            except Exception:
-                pass
+                script_path = self._script_pool.get_nowait()
+            except queue.Empty:
+                script_path = self._new_script_path()
+            try:
+                with open(script_path, "w", encoding="utf-8") as f:
+                    f.write(script_text)
+                proc = subprocess.Popen(
+                    self._argv_prefix + [script_path, "-SelectEmuBySN", str(emu_serial)],
+                    stdout=subprocess.PIPE, stderr=subprocess.STDOUT, text=True,
+                    creationflags=self._creationflags,
+                )
+                out, _ = proc.communicate()
+                return out or ""
+            finally:
+                self._script_pool.put(script_path)
+
+        with ThreadPoolExecutor(max_workers=len(jobs)) as pool:
+            return list(pool.map(_run_one, jobs))
 
     def analyze_output(self, text: str) -> FlashOutcome:
         """
@@ -155,37 +497,32 @@ class FlasherService:
 
         t = text.strip()
 
-        # Fatal errors
-        error_patterns = [
-            r"Target voltage too low",
-            r"Could not connect to the target device",
-            r"Error occurred:.*",
-            r"Unspecified error\b",
-            r"Failed to prepare for programming",
-            r"Failed to download RAMCode",
-            r"Verification of RAMCode failed",
-            r"Cannot connect",
-            r"Connection failed",
-            r"Cannot identify target",
-            r"J-Link.*error",
-            r"Error:",
-        ]
-
+        # One pass over the log: collect errors and success markers together.
+        # A fatal marker settles the verdict, so finditer (which is lazy) is
+        # abandoned there and the tail of the log is never scanned.
         errors: List[str] = []
-        for pat in error_patterns:
-            for m in re.finditer(pat, t, re.IGNORECASE):
-                errors.append(m.group(0))
+        saw_load = saw_ok = saw_prog = False
+        for m in _ANALYZE_RE.finditer(t):
+            if m.lastgroup == "fatal":
+                return FlashOutcome(False, [m.group("fatal")], [], text)
+            if m.lastgroup == "err":
+                errors.append(m.group("err"))
+            elif m.lastgroup == "load":
+                saw_load = True
+            elif m.lastgroup == "ok":
+                saw_ok = True
+            else:
+                saw_prog = True
         if errors:
-            return FlashOutcome(False, errors, [], text)
+            # Dedup repeated markers, preserving first-seen order
+            return FlashOutcome(False, list(dict.fromkeys(errors)), [], text)
 
         # Must see a 'loadfile' command
-        if "loadfile" not in t.lower():
+        if not saw_load:
             return FlashOutcome(False, ["No 'loadfile' found in output."], [], text)
 
         # Must see at least one O.K. or Program speed (case-insensitive)
-        if re.search(r"O\.K\.", t, re.IGNORECASE):
-            return FlashOutcome(True, [], [], text)
-        if re.search(r"Program\s*&\s*Verify", t, re.IGNORECASE) or re.search(r"Program speed", t, re.IGNORECASE):
+        if saw_ok or saw_prog:
             return FlashOutcome(True, [], [], text)
 
         # Fallback: fail if nothing matched
@@ -1,57 +1,79 @@
 # jlink_commands.py
+#
+# Command objects are immutable value objects: the rendered string is computed
+# once at construction and render() just returns it, so repeated script builds
+# pay no per-call formatting.
 
 class JLinkCommand:
+    __slots__ = ()
     def render(self) -> str:
         raise NotImplementedError()
 
 class SuppressGuiCommand(JLinkCommand):
+    __slots__ = ()
     def render(self): return "SuppressGUI 1"
 
 class DeviceCommand(JLinkCommand):
-    def __init__(self, device_line): self.device_line = device_line
-    def render(self): return self.device_line
+    __slots__ = ("_rendered",)
+    def __init__(self, device_line): self._rendered = device_line
+    def render(self): return self._rendered
 
 class InterfaceCommand(JLinkCommand):
-    def __init__(self, interface): self.interface = interface
-    def render(self): return f"IF {self.interface}"
+    __slots__ = ("_rendered",)
+    def __init__(self, interface): self._rendered = f"IF {interface}"
+    def render(self): return self._rendered
 
 class SpeedCommand(JLinkCommand):
-    def __init__(self, speed): self.speed = speed
-    def render(self): return f"Speed {self.speed}"
+    __slots__ = ("_rendered",)
+    def __init__(self, speed): self._rendered = f"Speed {speed}"
+    def render(self): return self._rendered
+
+class SelectEmuBySNCommand(JLinkCommand):
+    __slots__ = ("_rendered",)
+    def __init__(self, serial): self._rendered = f"SelectEmuBySN {serial}"
+    def render(self): return self._rendered
 
 class ConnectCommand(JLinkCommand):
+    __slots__ = ()
     def render(self): return "connect"
 
 class UnlockKinetisCommand(JLinkCommand):
+    __slots__ = ()
     def render(self): return "unlock kinetis"
 
 class ResetCommand(JLinkCommand):
+    __slots__ = ()
     def render(self): return "r"
 
 class EraseCommand(JLinkCommand):
+    __slots__ = ()
     def render(self): return "erase"
 
 class WriteRegisterCommand(JLinkCommand):
+    __slots__ = ("_rendered",)
     def __init__(self, width, addr, value):
-        self.width = width
-        self.addr = addr
-        self.value = value
-    def render(self): return f"w{self.width} 0x{self.addr:08X}, 0x{self.value:08X}"
+        self._rendered = f"w{width} 0x{addr:08X}, 0x{value:08X}"
+    def render(self): return self._rendered
 
 class SleepCommand(JLinkCommand):
-    def __init__(self, seconds): self.seconds = seconds
-    def render(self): return f"Sleep {self.seconds}"
+    __slots__ = ("_rendered",)
+    def __init__(self, seconds): self._rendered = f"Sleep {seconds}"
+    def render(self): return self._rendered
 
 class LoadFileCommand(JLinkCommand):
-    def __init__(self, file_path): self.file_path = file_path
-    def render(self): return f'loadfile "{self.file_path}" 0x0'
+    __slots__ = ("_rendered",)
+    def __init__(self, file_path, addr=0): self._rendered = f'loadfile "{file_path}" 0x{addr:X}'
+    def render(self): return self._rendered
 
 class CommentCommand(JLinkCommand):
-    def __init__(self, comment): self.comment = comment
-    def render(self): return f"// {self.comment}"   # <-- use '//' not '#'
+    __slots__ = ("_rendered",)
+    def __init__(self, comment): self._rendered = f"// {comment}"   # <-- use '//' not '#'
+    def render(self): return self._rendered
 
 class GoCommand(JLinkCommand):
+    __slots__ = ()
     def render(self): return "g"
 
 class ExitCommand(JLinkCommand):
+    __slots__ = ()
     def render(self): return "exit"
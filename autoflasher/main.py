@@ -1,23 +1,35 @@
 import sys
 import traceback
-import tkinter as tk
-from tkinter import messagebox
-from .views.main_view import AutoFlasherApp
-from autoflasher import config_service
-import os 
+import os
 
 APP_ROOT = os.path.dirname(os.path.abspath(__file__))
 
 def run() -> None:
+    # Tk imports live here so headless/CLI callers never pay the Tcl startup cost
+    import tkinter as tk
+    from .views.main_view import AutoFlasherApp
+
     root = tk.Tk()
     app = AutoFlasherApp(root, base_dir=APP_ROOT)   # Pass the real base_dir!
     root.mainloop()
 
+def flash_cli(folder: str, target: str) -> bool:
+    """Flash once without the GUI; prints status to stdout and returns success."""
+    from .viewmodels.flasher_vm import AutoFlasherViewModel
+
+    vm = AutoFlasherViewModel(APP_ROOT)
+    results = []
+    vm.on_status = lambda msg, is_error=False: print(msg, file=sys.stderr if is_error else sys.stdout)
+    vm.on_completed = results.append
+    vm.flash_sync(folder, target)
+    return bool(results and results[-1].success)
+
 def main() -> None:
     try:
         run()
     except Exception as e:
         try:
+            from tkinter import messagebox
             tb = "".join(traceback.format_exception(type(e), e, e.__traceback__))
             print(tb, file=sys.stderr)
             messagebox.showerror("Fatal Error", f"An unexpected error occurred:\n\n{e}")
@@ -1,4 +1,59 @@
 # utils.py
+import collections
+
+# Tk Text appends slow down linearly with total line count; keep the log bounded
+MAX_LOG_LINES = 2000
+
+
+class LogBatcher:
+    """
+    Coalesces log lines into batched Tk Text inserts.
+
+    write_log costs four Tk round-trips per message; when J-Link output is
+    streamed line-by-line that stalls the GUI thread. Appends go into a deque
+    and a single flush scheduled for the next idle tick drains them with one
+    insert per run of same-tagged lines.
+    """
+
+    def __init__(self, text_widget):
+        self.widget = text_widget
+        self._queue = collections.deque()
+        self._pending = False
+        # Configure tags once, not per message
+        text_widget.tag_configure("error", foreground="red")
+        text_widget.tag_configure("info", foreground="#eee")
+
+    def append(self, message: str, is_error: bool = False) -> None:
+        tag = "error" if is_error else "info"
+        self._queue.append(((message or "").rstrip() + "\n", tag))
+        if not self._pending:
+            self._pending = True
+            self.widget.after_idle(self._flush)
+
+    def _flush(self) -> None:
+        self._pending = False
+        if not self._queue:
+            return
+        w = self.widget
+        w.config(state="normal")
+        run = []
+        run_tag = None
+        while self._queue:
+            text, tag = self._queue.popleft()
+            if run and tag != run_tag:
+                w.insert("end", "".join(run), run_tag)
+                run = []
+            run_tag = tag
+            run.append(text)
+        if run:
+            w.insert("end", "".join(run), run_tag)
+        # Drop the oldest lines once the widget exceeds the cap
+        line_count = int(w.index("end-1c").split(".")[0])
+        if line_count > MAX_LOG_LINES:
+            w.delete("1.0", f"{line_count - MAX_LOG_LINES}.0")
+        w.see("end")
+        w.config(state="disabled")
+
 
 def write_log(text_widget, message: str, is_error: bool = False) -> None:
     """Append a line to the GUI log window, auto-scroll, and colorize."""
@@ -1,13 +1,17 @@
 # view_model.py
 from __future__ import annotations
 
+import asyncio
+import collections
 import os
 import threading
-from typing import Callable, Optional, List, Any
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Optional, List, Tuple, Any
 
 from autoflasher.config_service import load_config, save_config, JLINK_WINDOWS, JLINK_UNIX
-from autoflasher.flasher_service import FlasherService
-from ..models.firmware_models import FlashOutcome
+from autoflasher.flasher_service import FlasherService, FlashOutcome, OutputAnalyzer
+
+_IS_WIN = os.name == "nt"
 
 
 class AutoFlasherViewModel:
@@ -24,6 +28,12 @@ class AutoFlasherViewModel:
       - on_status:   Callable[[str, bool], None]      # (message, is_error)
       - on_log:      Callable[[str, bool], None]      # (message, is_error)
       - on_completed:Callable[[FlashOutcome], None]
+
+    Worker code never invokes the callbacks directly: events are posted to a
+    deque and the View drains them from the Tk thread via a periodic
+    root.after(..., drain_events) callback, so Tk is only ever touched from
+    its own thread. Deque append/popleft are atomic under the GIL, so no
+    lock is needed.
     """
 
     # ---------- lifecycle ----------
@@ -40,36 +50,82 @@ class AutoFlasherViewModel:
         self.jlink_path = self._resolve_jlink_path()
         self._svc = self._make_service()
 
+        # One asyncio loop on a dedicated background thread drives all flash
+        # jobs; no per-flash thread creation, no blocking subprocess waits.
+        # A single long-lived consumer drains the job queue so flashes run in
+        # submission order and never contend for the J-Link binary. Started
+        # lazily on the first flash_async so synchronous callers (CLI,
+        # tests) never spin it up — a never-cancelled consumer otherwise
+        # dumps "Task was destroyed but it is pending!" at interpreter exit.
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._job_q: "asyncio.Queue[Tuple[str, str, bool]]" = asyncio.Queue()
+        self._consumer_future = None
+
+        # Created on first batch flash; reused for the life of the ViewModel
+        self._batch_executor: Optional[ThreadPoolExecutor] = None
+
+        # Pending events for the View to drain from the Tk thread
+        self._event_q: "collections.deque" = collections.deque(maxlen=4096)
+
+        # (target, folder, digest) of the flash in progress; recorded to the
+        # service's flash cache once the outcome is verified successful
+        self._pending_flash: Optional[Tuple[str, str, str]] = None
+
     # ---------- helpers ----------
+    def _post(self, kind: str, payload: Any, is_error: bool = False) -> None:
+        """Queue an event for drain_events; safe from any thread."""
+        self._event_q.append((kind, payload, is_error))
+
+    def drain_events(self) -> None:
+        """Dispatch queued events to the registered callbacks.
+
+        Call this from the UI thread (e.g. a periodic root.after callback).
+        """
+        q = self._event_q
+        while q:
+            kind, payload, is_error = q.popleft()
+            if kind == "status":
+                if self.on_status:
+                    self.on_status(payload, is_error)
+                if self.on_log:
+                    self.on_log(payload, is_error)
+            elif kind == "log":
+                if self.on_log:
+                    self.on_log(payload, is_error)
+            elif kind == "completed":
+                if self.on_completed:
+                    self.on_completed(payload)
+
     def _emit_status(self, msg: str, is_error: bool = False) -> None:
-        if self.on_status:
-            self.on_status(msg, is_error)
-        if self.on_log:
-            self.on_log(msg, is_error)
+        self._post("status", msg, is_error)
+
+    def _emit_completed(self, outcome: FlashOutcome) -> None:
+        self._post("completed", outcome)
 
     def _resolve_jlink_path(self) -> str:
         """Choose jlink_path from config or OS-specific default."""
         p = self.config.get("jlink_path", "").strip()
-        return p or (JLINK_WINDOWS if os.name == "nt" else JLINK_UNIX)
+        return p or (JLINK_WINDOWS if _IS_WIN else JLINK_UNIX)
 
-    def _make_service(self) -> FlasherService:
-        """Create a FlasherService instance based on current config."""
-        firmware_root = self.config.get("firmware_root", "firmware")
+    def _normalized_exts(self) -> Optional[List[str]]:
+        """Firmware extensions from config, normalized to start with a dot."""
         exts: Optional[List[str]] = self.config.get("firmware_exts")
         try:
-            # Normalize extensions if provided (ensure they start with a dot)
             if isinstance(exts, list):
                 exts = [e if e.startswith(".") else f".{e}" for e in exts]
         except Exception:
             exts = None
+        return exts
 
+    def _make_service(self) -> FlasherService:
+        """Create a FlasherService instance based on current config."""
         return FlasherService(
             base_dir=self.base_dir,
             jlink_path=self.jlink_path,
             interface=self.config.get("jlink_interface", "SWD"),
             speed_khz=int(self.config.get("jlink_speed", 4000)),
-            firmware_root=firmware_root,
-            allowed_exts=exts,
+            firmware_root=self.config.get("firmware_root", "firmware"),
+            allowed_exts=self._normalized_exts(),
         )
 
     # ---------- queries ----------
@@ -82,18 +138,108 @@ class AutoFlasherViewModel:
         return self.config
 
     # ---------- commands ----------
-    def flash_async(self, folder: str, target: str) -> None:
-        """Kick off flashing in a background thread."""
-        t = threading.Thread(target=self._flash_worker, args=(folder, target), daemon=True)
-        t.start()
+    def _ensure_loop(self) -> asyncio.AbstractEventLoop:
+        """Start the background loop and job consumer on first use."""
+        if self._loop is None:
+            self._loop = asyncio.new_event_loop()
+            threading.Thread(target=self._loop.run_forever, daemon=True).start()
+            self._consumer_future = asyncio.run_coroutine_threadsafe(
+                self._job_consumer(), self._loop
+            )
+        return self._loop
+
+    def close(self) -> None:
+        """Cancel the job consumer and stop the background loop, if started."""
+        loop = self._loop
+        if loop is None:
+            return
+        self._loop = None
+        self._consumer_future = None
+
+        async def _shutdown() -> None:
+            # Cancel and await the consumer so the loop stops with no task
+            # still pending (which would warn at interpreter exit).
+            for task in asyncio.all_tasks():
+                if task is not asyncio.current_task():
+                    task.cancel()
+                    try:
+                        await task
+                    except asyncio.CancelledError:
+                        pass
+            loop.stop()
+
+        asyncio.run_coroutine_threadsafe(_shutdown(), loop)
+
+    def flash_async(self, folder: str, target: str, force: bool = False) -> None:
+        """Queue a flash job; the background consumer runs jobs in order.
+
+        Pass force=True to flash even if the same image was already programmed.
+        """
+        self._ensure_loop().call_soon_threadsafe(self._job_q.put_nowait, (folder, target, force))
+
+    async def _job_consumer(self) -> None:
+        """Long-lived task draining the flash job queue one job at a time."""
+        while True:
+            folder, target, force = await self._job_q.get()
+            try:
+                await self._flash_coro(folder, target, force)
+            finally:
+                self._job_q.task_done()
+
+    def flash_many_async(self, jobs: List[Tuple[str, str, str]]) -> None:
+        """Flash several probes at once; jobs are (folder, target, emu_serial) triples."""
+        if self._batch_executor is None:
+            self._batch_executor = ThreadPoolExecutor(max_workers=1)
+        self._batch_executor.submit(self._flash_many_worker, jobs)
+
+    def _flash_many_worker(self, jobs: List[Tuple[str, str, str]]) -> None:
+        """Fan a batch of flash jobs out to the service; runs off the UI thread."""
+        scripts: List[Tuple[str, str]] = []
+        for folder, target, emu_serial in jobs:
+            search_tag = f"_{target.lower()}_"
+            fw_path = self._svc.find_firmware_file(folder, search_tag)
+            if not fw_path:
+                msg = f"No file containing '{search_tag}' found in {folder}"
+                self._emit_status(msg, True)
+                self._emit_completed(FlashOutcome(False, [msg], []))
+                continue
+            scripts.append((self._svc.build_script(target, fw_path, emu_serial), emu_serial))
+
+        if not scripts:
+            return
+
+        self._emit_status(f"Flashing {len(scripts)} device(s) in parallel. Please wait...")
+        try:
+            outputs = self._svc.run_scripts_parallel(scripts)
+        except Exception as e:
+            self._emit_completed(FlashOutcome(False, [str(e)], [], ""))
+            return
+
+        failures = 0
+        for (_, emu_serial), out in zip(scripts, outputs):
+            self._post("log", f"--- J-Link output (SN {emu_serial}) ---\n" + (out or ""))
+            outcome = self._svc.analyze_output(out)
+            if not outcome.success:
+                failures += 1
+            self._emit_completed(outcome)
+
+        if failures:
+            self._emit_status(f"{failures} of {len(scripts)} device(s) failed to flash.", True)
+        else:
+            self._emit_status("All devices flashed successfully!", False)
 
-    def _flash_worker(self, folder: str, target: str) -> None:
-        """Actual flashing flow; runs off the UI thread."""
+    def _prepare_flash(self, folder: str, target: str, force: bool = False) -> Optional[str]:
+        """Validate selections and build the script.
+
+        Emits the relevant events and returns None when there is nothing to
+        run: bad selections, no firmware file, or the same image was already
+        flashed successfully (unless force is set).
+        """
+        self._pending_flash = None
         if not folder or not target:
             self._emit_status("Both folder and target must be selected.", True)
-            if self.on_completed:
-                self.on_completed(FlashOutcome(False, ["Missing selections."], []))
-            return
+            self._emit_completed(FlashOutcome(False, ["Missing selections."], []))
+            return None
 
         self._emit_status("Searching for firmware file...")
         search_tag = f"_{target.lower()}_"
@@ -101,30 +247,81 @@ class AutoFlasherViewModel:
         if not fw_path:
             msg = f"No file containing '{search_tag}' found in {folder}"
             self._emit_status(msg, True)
-            if self.on_completed:
-                self.on_completed(FlashOutcome(False, [msg], []))
-            return
+            self._emit_completed(FlashOutcome(False, [msg], []))
+            return None
+
+        # Skip the ~15 s J-Link spawn when this exact image already flashed
+        # successfully for this target/folder and the caller didn't force.
+        try:
+            digest = self._svc.file_digest(fw_path)
+        except OSError:
+            digest = None
+        if digest:
+            if not force and self._svc.is_flash_cached(target, folder, digest):
+                self._emit_status("Firmware unchanged since last successful flash; skipping.", False)
+                self._emit_completed(FlashOutcome(True, [], [], cached=True))
+                return None
+            self._pending_flash = (target, folder, digest)
 
         self._emit_status("Building J-Link script...")
-        script = self._svc.build_script(target, fw_path)
+        return self._svc.build_script(target, fw_path)
+
+    def _report_outcome(self, outcome: FlashOutcome) -> None:
+        """Emit a summary status and the completion event."""
+        if outcome.success:
+            if self._pending_flash is not None:
+                self._svc.record_flash(*self._pending_flash)
+            self._emit_status("Flashing completed successfully!", False)
+        else:
+            self._emit_status("Flash appears to have failed.", True)
+
+        self._emit_completed(outcome)
+
+    async def _flash_coro(self, folder: str, target: str, force: bool = False) -> None:
+        """Flashing flow as a coroutine; runs on the background loop."""
+        script = self._prepare_flash(folder, target, force)
+        if script is None:
+            return
 
         self._emit_status("Flashing device. Please wait...")
         try:
-            out = self._svc.run_script(script)
-            if self.on_log:
-                self.on_log("--- J-Link output ---\n" + (out or ""), False)
-            outcome = self._svc.analyze_output(out)
+            self._post("log", "--- J-Link output ---")
+            analyzer = OutputAnalyzer()
+
+            def _line(line: str) -> None:
+                self._post("log", line.rstrip("\n"))
+                analyzer.feed(line)
+
+            await self._svc.run_script_async(script, on_line=_line)
+            outcome = analyzer.outcome()
         except Exception as e:
             outcome = FlashOutcome(False, [str(e)], [], "")
 
-        # Emit a summary status and completion event
-        if outcome.success:
-            self._emit_status("Flashing completed successfully!", False)
-        else:
-            self._emit_status("Flash appears to have failed.", True)
+        self._report_outcome(outcome)
 
-        if self.on_completed:
-            self.on_completed(outcome)
+    def flash_sync(self, folder: str, target: str, force: bool = False) -> None:
+        """Flash synchronously on the calling thread (CLI / scripting use)."""
+        self._flash_worker(folder, target, force)
+        self.drain_events()
+
+    def _flash_worker(self, folder: str, target: str, force: bool = False) -> None:
+        """Synchronous flashing flow, for callers without an event loop (CLI, tests)."""
+        script = self._prepare_flash(folder, target, force)
+        if script is None:
+            return
+
+        self._emit_status("Flashing device. Please wait...")
+        try:
+            self._post("log", "--- J-Link output ---")
+            analyzer = OutputAnalyzer()
+            for line in self._svc.iter_script_output(script):
+                self._post("log", line.rstrip("\n"))
+                analyzer.feed(line)
+            outcome = analyzer.outcome()
+        except Exception as e:
+            outcome = FlashOutcome(False, [str(e)], [], "")
+
+        self._report_outcome(outcome)
 
     # ---------- configuration ----------
     def save_config(
@@ -169,8 +366,15 @@ class AutoFlasherViewModel:
         # persist to disk
         save_config(self.base_dir, self.config)
 
-        # hot-apply: rebuild path + service
+        # hot-apply: rebind the existing service in place (keeps its caches;
+        # the listing cache is invalidated only if firmware_root changed)
         self.jlink_path = self._resolve_jlink_path()
-        self._svc = self._make_service()
+        self._svc.update(
+            jlink_path=self.jlink_path,
+            interface=self.config.get("jlink_interface", "SWD"),
+            speed_khz=int(self.config.get("jlink_speed", 4000)),
+            firmware_root=self.config.get("firmware_root", "firmware"),
+            allowed_exts=self._normalized_exts(),
+        )
 
         self._emit_status("Configuration saved. Some changes apply immediately.", False)
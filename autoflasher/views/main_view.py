@@ -1,15 +1,17 @@
 # views/main_view.py
 from __future__ import annotations
 
+import collections
 import tkinter as tk
 from tkinter import messagebox, filedialog
 from tkinter.ttk import Label, Button, Combobox, Frame, Scrollbar
 
 from ..viewmodels.flasher_vm import AutoFlasherViewModel
-from ..utils import write_log
+from ..utils import LogBatcher
 import os
 
 SUPPORTED_TARGETS = ("IO", "Delsys", "Logo")
+_TARGET_LOOKUP = {t.casefold(): t for t in SUPPORTED_TARGETS}
 
 class AutoFlasherApp:
     """Tk 'View' layer. No business logic lives here—it's all in the ViewModel."""
@@ -28,7 +30,7 @@ class AutoFlasherApp:
         self.vm.on_completed = self._on_completed
 
         # --- Folder list from VM (scoped to firmware_root) ---
-        self.list_folders = self.vm.list_folders()
+        self._set_folder_list(self.vm.list_folders())
 
         # === Folder Selection ===
         Label(self.root, text="Select Folder:").pack(pady=(20, 5))
@@ -50,40 +52,60 @@ class AutoFlasherApp:
         self.flash_button = Button(self.root, text="Flash", command=self.on_flash)
         self.flash_button.pack(pady=8)
 
+        # Override for the unchanged-image skip, e.g. when flashing the next
+        # identical board with the same firmware on a production line.
+        self.force_flash = tk.BooleanVar(value=False)
+        self.force_check = tk.Checkbutton(
+            self.root, text="Re-flash even if firmware is unchanged", variable=self.force_flash
+        )
+        self.force_check.pack()
+
         self.config_button = Button(self.root, text="Edit Settings...", command=self.open_config_editor)
         self.config_button.pack(pady=(0, 10))
 
         # === Status ===
-        self.status_var = tk.StringVar()
-        self.status_label = tk.Label(self.root, textvariable=self.status_var, anchor="w", fg="blue")
+        # Plain label updated via one config(text=..., fg=...) call; a
+        # StringVar would add a trace plus a second Tcl round-trip per update.
+        self._ERR = "red"
+        self._OK = "blue"
+        self.status_label = tk.Label(self.root, text="", anchor="w", fg=self._OK)
         self.status_label.pack(fill="x", padx=10, pady=(0, 5))
 
-        # === Collapsible Log (create BEFORE first status) ===
+        # === Collapsible Log ===
+        # The Text widget is the most expensive widget in the window; build it
+        # lazily on first reveal and buffer any lines that arrive before then.
         self.log_visible = False
         self.toggle_log_button = Button(self.root, text="Show Log ▼", command=self.toggle_log)
         self.toggle_log_button.pack(fill="x", padx=10, pady=(0, 2))
 
-        self.log_frame = Frame(self.root)
-        self.log_text = tk.Text(
-            self.log_frame, wrap="word", height=10, state="disabled",
-            bg="#222", fg="#eee", font=("Consolas", 10)
-        )
-        self.log_text.pack(side="left", fill="both", expand=True)
-        self.scrollbar = Scrollbar(self.log_frame, command=self.log_text.yview)
-        self.scrollbar.pack(side="right", fill="y")
-        self.log_text.config(yscrollcommand=self.scrollbar.set)
+        self.log_frame = None
+        self.log_text = None
+        self._batcher = None
+        self._pre_log = collections.deque()
 
         # Initial status
         self._on_status(f"Using J-Link at: {self.vm.jlink_path}", False)
 
+        # Pull VM events onto the Tk thread; workers never touch Tk directly
+        self.root.after(20, self._drain_events)
+
     # ===== VM event handlers =====
+    def _drain_events(self):
+        self.vm.drain_events()
+        self.root.after(20, self._drain_events)
+
     def _on_status(self, msg: str, is_error: bool):
-        self.status_var.set(msg)
-        self.status_label.config(fg="red" if is_error else "blue")
-        write_log(self.log_text, msg, is_error)
+        self.status_label.config(text=msg, fg=self._ERR if is_error else self._OK)
+        self._append_log(msg, is_error)
 
     def _on_log(self, msg: str, is_error: bool):
-        write_log(self.log_text, msg, is_error)
+        self._append_log(msg, is_error)
+
+    def _append_log(self, msg: str, is_error: bool):
+        if self._batcher is None:
+            self._pre_log.append((msg, is_error))
+        else:
+            self._batcher.append(msg, is_error)
 
     def _on_completed(self, outcome):
         if outcome.success:
@@ -95,6 +117,8 @@ class AutoFlasherApp:
 
     # ===== UI actions =====
     def toggle_log(self):
+        if self.log_frame is None:
+            self._build_log_widgets()
         if self.log_visible:
             self.log_frame.pack_forget()
             self.toggle_log_button.config(text="Show Log ▼")
@@ -103,14 +127,37 @@ class AutoFlasherApp:
             self.toggle_log_button.config(text="Hide Log ▲")
         self.log_visible = not self.log_visible
 
+    def _build_log_widgets(self):
+        """Create the log frame/Text on first reveal and replay buffered lines."""
+        self.log_frame = Frame(self.root)
+        self.log_text = tk.Text(
+            self.log_frame, wrap="word", height=10, state="disabled",
+            bg="#222", fg="#eee", font=("Consolas", 10)
+        )
+        self.log_text.pack(side="left", fill="both", expand=True)
+        self.scrollbar = Scrollbar(self.log_frame, command=self.log_text.yview)
+        self.scrollbar.pack(side="right", fill="y")
+        self.log_text.config(yscrollcommand=self.scrollbar.set)
+        self._batcher = LogBatcher(self.log_text)
+        while self._pre_log:
+            self._batcher.append(*self._pre_log.popleft())
+
     def on_flash(self):
         self.flash_button.config(state="disabled")
-        self.vm.flash_async(self.selected_folder.get(), self.selected_target.get())
+        self.vm.flash_async(
+            self.selected_folder.get(), self.selected_target.get(),
+            force=self.force_flash.get(),
+        )
 
     # ===== defaults from config =====
+    def _set_folder_list(self, folders):
+        """Bind the folder list and its case-insensitive lookup together."""
+        self.list_folders = folders
+        self._folder_lookup = {f.casefold(): f for f in folders}
+
     def _apply_default_folder(self):
         default = (self.vm.config.get("default_folder") or "").strip()
-        matched = next((f for f in self.list_folders if f.lower() == default.lower()), None)
+        matched = self._folder_lookup.get(default.casefold())
         if matched:
             self.combo_folder.set(matched)
         elif self.list_folders:
@@ -118,7 +165,7 @@ class AutoFlasherApp:
 
     def _apply_default_target(self):
         default = (self.vm.config.get("default_target") or "").strip()
-        matched = next((t for t in SUPPORTED_TARGETS if t.lower() == default.lower()), None)
+        matched = _TARGET_LOOKUP.get(default.casefold())
         if matched:
             self.combo_target.set(matched)
         else:
@@ -127,16 +174,29 @@ class AutoFlasherApp:
     # ===== Config editor =====
     def open_config_editor(self):
         cfg = self.vm.get_config()
+        # Destructure once; also keeps the editor defaults in one place
+        jlink_path = cfg.get("jlink_path", "")
+        jlink_interface = cfg.get("jlink_interface", "SWD")
+        jlink_speed = cfg.get("jlink_speed", 4000)
+        firmware_root = cfg.get("firmware_root", "firmware")
+        firmware_exts = cfg.get("firmware_exts", [])
+        default_folder = cfg.get("default_folder", "")
+        default_target = cfg.get("default_target", "")
 
         top = tk.Toplevel(self.root)
         top.title("Edit Configuration")
         top.geometry("460x470")
         top.grab_set()  # modal
+        top.grid_columnconfigure(0, weight=1)
 
-        # J-Link path
-        tk.Label(top, text="J-Link Executable Path:").pack(anchor="w", padx=12, pady=(15, 2))
-        jlink_var = tk.StringVar(value=cfg.get("jlink_path", ""))
-        tk.Entry(top, textvariable=jlink_var, width=48).pack(anchor="w", padx=12)
+        # Widgets are created first and laid out in one grid pass below; a
+        # single geometry manager invocation per widget beats interleaved
+        # pack() calls that each trigger a relayout of everything above them.
+        jlink_label = tk.Label(top, text="J-Link Executable Path:")
+        # Plain Entries read via .get() at save time; a StringVar per field
+        # would install a Tcl trace that fires on every keystroke for nothing.
+        jlink_entry = tk.Entry(top, width=48)
+        jlink_entry.insert(0, jlink_path)
 
         def browse_jlink():
             exe = filedialog.askopenfilename(
@@ -144,74 +204,95 @@ class AutoFlasherApp:
                 filetypes=[("Executable", "*.exe;*.*")] if os.name == "nt" else [("All files", "*.*")]
             )
             if exe:
-                jlink_var.set(exe)
+                jlink_entry.delete(0, "end")
+                jlink_entry.insert(0, exe)
 
-        Button(top, text="Browse...", command=browse_jlink).pack(anchor="w", padx=12, pady=(2, 10))
+        browse_button = Button(top, text="Browse...", command=browse_jlink)
 
-        # Interface
-        tk.Label(top, text="J-Link Interface:").pack(anchor="w", padx=12)
-        interface_var = tk.StringVar(value=cfg.get("jlink_interface", "SWD"))
+        interface_label = tk.Label(top, text="J-Link Interface:")
+        interface_var = tk.StringVar(value=jlink_interface)
         interface_combo = Combobox(top, textvariable=interface_var, state="readonly", width=16)
         interface_combo["values"] = ("SWD", "JTAG")
-        interface_combo.pack(anchor="w", padx=12, pady=(0, 8))
-
-        # Speed
-        tk.Label(top, text="J-Link Speed (kHz):").pack(anchor="w", padx=12)
-        speed_var = tk.StringVar(value=str(cfg.get("jlink_speed", 4000)))
-        tk.Entry(top, textvariable=speed_var, width=16).pack(anchor="w", padx=12, pady=(0, 8))
-
-        # Firmware root (subfolder under app dir)
-        tk.Label(top, text="Firmware Root Folder (relative):").pack(anchor="w", padx=12)
-        fw_root_var = tk.StringVar(value=cfg.get("firmware_root", "firmware"))
-        tk.Entry(top, textvariable=fw_root_var, width=28).pack(anchor="w", padx=12, pady=(0, 8))
-
-        # Firmware extensions (comma-separated)
-        tk.Label(top, text="Firmware Extensions (e.g. .axf,.elf,.bin):").pack(anchor="w", padx=12)
-        fw_exts_var = tk.StringVar(value=",".join(cfg.get("firmware_exts", [])))
-        tk.Entry(top, textvariable=fw_exts_var, width=38).pack(anchor="w", padx=12, pady=(0, 8))
-
-        # Default folder
-        tk.Label(top, text="Default Folder:").pack(anchor="w", padx=12)
-        folder_var = tk.StringVar(value=cfg.get("default_folder", ""))
+
+        speed_label = tk.Label(top, text="J-Link Speed (kHz):")
+        speed_entry = tk.Entry(top, width=16)
+        speed_entry.insert(0, str(jlink_speed))
+
+        fw_root_label = tk.Label(top, text="Firmware Root Folder (relative):")
+        fw_root_entry = tk.Entry(top, width=28)
+        fw_root_entry.insert(0, firmware_root)
+
+        fw_exts_label = tk.Label(top, text="Firmware Extensions (e.g. .axf,.elf,.bin):")
+        fw_exts_entry = tk.Entry(top, width=38)
+        fw_exts_entry.insert(0, ",".join(firmware_exts))
+
+        folder_label = tk.Label(top, text="Default Folder:")
+        folder_var = tk.StringVar(value=default_folder)
         folder_combo = Combobox(top, textvariable=folder_var, state="readonly", width=28)
         folder_combo["values"] = self.list_folders
-        folder_combo.pack(anchor="w", padx=12, pady=(0, 8))
 
-        # Default target
-        tk.Label(top, text="Default Target:").pack(anchor="w", padx=12)
-        target_var = tk.StringVar(value=cfg.get("default_target", ""))
+        target_label = tk.Label(top, text="Default Target:")
+        target_var = tk.StringVar(value=default_target)
         target_combo = Combobox(top, textvariable=target_var, state="readonly", width=20)
         target_combo["values"] = SUPPORTED_TARGETS
-        target_combo.pack(anchor="w", padx=12, pady=(0, 16))
+
+        rows = (
+            (jlink_label, (15, 2)),
+            (jlink_entry, 0),
+            (browse_button, (2, 10)),
+            (interface_label, 0),
+            (interface_combo, (0, 8)),
+            (speed_label, 0),
+            (speed_entry, (0, 8)),
+            (fw_root_label, 0),
+            (fw_root_entry, (0, 8)),
+            (fw_exts_label, 0),
+            (fw_exts_entry, (0, 8)),
+            (folder_label, 0),
+            (folder_combo, (0, 8)),
+            (target_label, 0),
+            (target_combo, (0, 16)),
+        )
+        for row, (widget, pady) in enumerate(rows):
+            widget.grid(row=row, column=0, sticky="w", padx=12, pady=pady)
 
         # Buttons
         btns = tk.Frame(top)
-        btns.pack(fill="x", padx=10, pady=(0, 10))
+        btns.grid(row=len(rows), column=0, sticky="ew", padx=10, pady=(0, 10))
 
         def save_changes():
             try:
-                speed_val = int(speed_var.get())
+                speed_val = int(speed_entry.get())
                 if speed_val <= 0:
                     raise ValueError
             except Exception:
                 messagebox.showerror("Invalid Input", "J-Link Speed must be a positive integer.", parent=top)
                 return
 
-            raw_exts = [e.strip() for e in fw_exts_var.get().split(",") if e.strip()]
-            norm_exts = [(e if e.startswith(".") else f".{e}") for e in raw_exts]
+            # One pass: strip, drop empties, and ensure the leading dot
+            norm_exts = [
+                tok if tok.startswith(".") else f".{tok}"
+                for tok in (e.strip() for e in fw_exts_entry.get().split(","))
+                if tok
+            ]
 
             self.vm.save_config(
-                jlink_path=jlink_var.get(),
+                jlink_path=jlink_entry.get(),
                 interface=interface_var.get(),
                 speed_khz=speed_val,
                 default_folder=folder_var.get(),
                 default_target=target_var.get(),
-                firmware_root=fw_root_var.get(),
+                firmware_root=fw_root_entry.get(),
                 firmware_exts=norm_exts,
             )
 
-            self.list_folders = self.vm.list_folders()
-            self.combo_folder["values"] = self.list_folders
+            # Only re-send the folder list to Tcl when it actually changed;
+            # the default selection is still reapplied since the user may
+            # have just edited it.
+            previous = self.list_folders
+            self._set_folder_list(self.vm.list_folders())
+            if self.list_folders != previous:
+                self.combo_folder["values"] = self.list_folders
             self._apply_default_folder()
             self._apply_default_target()
 
@@ -219,3 +300,4 @@ class AutoFlasherApp:
 
         Button(btns, text="Cancel", command=top.destroy, width=10).pack(side="right", padx=6)
         Button(btns, text="Save", command=save_changes, width=10).pack(side="right")
+
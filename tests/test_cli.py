@@ -0,0 +1,82 @@
+import json
+import os
+
+import pytest
+
+import autoflasher.cli as cli
+
+# The fake J-Link is a shell script, so these tests are POSIX-only; the
+# pure-logic CLI paths below don't need it.
+posix_only = pytest.mark.skipif(os.name == "nt", reason="fake J-Link is a shell script")
+
+FAKE_JLINK_OK = "#!/bin/sh\necho 'loadfile \"x\" 0x0'\necho 'O.K.'\n"
+
+
+def make_app_root(tmp_path, monkeypatch, jlink_body=FAKE_JLINK_OK):
+    """Lay out a base dir with a fake J-Link, a firmware tree, and config.json."""
+    fake = tmp_path / "fakejlink.sh"
+    fake.write_text(jlink_body)
+    fake.chmod(0o755)
+
+    rel = tmp_path / "firmware" / "RelA"
+    rel.mkdir(parents=True)
+    (rel / "app_io_v1.bin").write_bytes(b"IMG")
+
+    (tmp_path / "config.json").write_text(json.dumps({
+        "jlink_path": str(fake),
+        "firmware_root": str(tmp_path / "firmware"),
+    }))
+    monkeypatch.setattr(cli, "APP_ROOT", str(tmp_path))
+    return tmp_path
+
+
+def run_cli(capsys, args):
+    rc = cli.cli(args)
+    return rc, json.loads(capsys.readouterr().out)
+
+
+@posix_only
+def test_cli_success_exit_code_and_json(tmp_path, monkeypatch, capsys):
+    make_app_root(tmp_path, monkeypatch)
+    rc, result = run_cli(capsys, ["--folder", "RelA", "--target", "IO", "--json-log"])
+    assert rc == 0
+    assert result["success"] is True
+    assert result["errors"] == []
+
+
+def test_cli_missing_firmware_reports_real_errors(tmp_path, monkeypatch, capsys):
+    make_app_root(tmp_path, monkeypatch)
+    rc, result = run_cli(capsys, ["--folder", "RelA", "--target", "Delsys", "--json-log"])
+    assert rc == 1
+    assert result["success"] is False
+    assert result["errors"] and "_delsys_" in result["errors"][0]
+
+
+@posix_only
+def test_cli_skips_unchanged_image_and_force_overrides(tmp_path, monkeypatch, capsys):
+    make_app_root(tmp_path, monkeypatch)
+    args = ["--folder", "RelA", "--target", "IO", "--json-log"]
+    rc, _ = run_cli(capsys, args)
+    assert rc == 0
+    assert (tmp_path / "flash_cache.json").exists()
+
+    # Second run short-circuits on the cached digest (still a success)...
+    rc, result = run_cli(capsys, args)
+    assert rc == 0 and result["success"] is True
+
+    # ...and a changed image or --force flashes again
+    (tmp_path / "firmware" / "RelA" / "app_io_v1.bin").write_bytes(b"IMG2")
+    rc, result = run_cli(capsys, args + ["--force"])
+    assert rc == 0 and result["success"] is True
+
+
+@posix_only
+def test_cli_failed_flash_propagates_jlink_errors(tmp_path, monkeypatch, capsys):
+    make_app_root(
+        tmp_path, monkeypatch,
+        jlink_body="#!/bin/sh\necho 'Cannot connect to target.'\n",
+    )
+    rc, result = run_cli(capsys, ["--folder", "RelA", "--target", "IO", "--json-log"])
+    assert rc == 1
+    assert result["success"] is False
+    assert result["errors"] == ["Cannot connect"]
@@ -0,0 +1,166 @@
+import os
+import hashlib
+
+import pytest
+
+from autoflasher.flasher_service import (
+    FlasherService,
+    FlashOutcome,
+    OutputAnalyzer,
+)
+
+# Sample outputs (trimmed to essentials)
+OUTPUT_SUCCESS = """
+Connecting to target via SWD
+InitTarget() start
+J-Link>loadfile "C:\\file.axf" 0x0
+J-Link: Flash download: Program & Verify: ...
+O.K.
+J-Link>exit
+"""
+
+OUTPUT_VOLTAGE_LOW = """
+Connecting to target via SWD
+Target voltage too low. Please check https://wiki.segger.com/J-Link_cannot_connect_to_the_CPU#Target_connection.
+Error occurred: Could not connect to the target device.
+J-Link>exit
+"""
+
+OUTPUT_GENERIC_ERRORS = """
+J-Link>loadfile "C:\\file.axf" 0x0
+Error: something went wrong
+Error: something went wrong
+Unspecified error -1
+J-Link>exit
+"""
+
+
+def make_service(tmp_path, jlink_path="JLink.exe", **kwargs):
+    kwargs.setdefault("firmware_root", str(tmp_path / "firmware"))
+    return FlasherService(
+        base_dir=str(tmp_path),
+        jlink_path=jlink_path,
+        interface="SWD",
+        speed_khz=4000,
+        **kwargs,
+    )
+
+
+# ===== analyze_output =====
+
+def test_analyze_output_success(tmp_path):
+    svc = make_service(tmp_path)
+    outcome = svc.analyze_output(OUTPUT_SUCCESS)
+    assert outcome.success is True
+    assert not outcome.errors
+
+
+def test_analyze_output_fatal_short_circuits(tmp_path):
+    # A fatal marker settles the verdict immediately; only it is reported,
+    # even though success markers appear later in the log.
+    svc = make_service(tmp_path)
+    outcome = svc.analyze_output(OUTPUT_VOLTAGE_LOW + OUTPUT_SUCCESS)
+    assert outcome.success is False
+    assert outcome.errors == ["Target voltage too low"]
+
+
+def test_analyze_output_dedups_generic_errors(tmp_path):
+    svc = make_service(tmp_path)
+    outcome = svc.analyze_output(OUTPUT_GENERIC_ERRORS)
+    assert outcome.success is False
+    assert outcome.errors.count("Error:") == 1
+
+
+def test_analyze_output_empty_and_missing_loadfile(tmp_path):
+    svc = make_service(tmp_path)
+    assert svc.analyze_output("").success is False
+    no_load = svc.analyze_output("Connecting...\nO.K.\n")
+    assert no_load.success is False
+    assert "loadfile" in no_load.errors[0]
+
+
+# ===== OutputAnalyzer =====
+
+def test_output_analyzer_matches_batch_analysis(tmp_path):
+    svc = make_service(tmp_path)
+    for sample in (OUTPUT_SUCCESS, OUTPUT_VOLTAGE_LOW, OUTPUT_GENERIC_ERRORS):
+        analyzer = OutputAnalyzer()
+        for line in sample.splitlines(keepends=True):
+            analyzer.feed(line)
+        incremental = analyzer.outcome()
+        batch = svc.analyze_output(sample)
+        assert incremental.success == batch.success
+        assert incremental.errors == batch.errors
+
+
+def test_output_analyzer_seals_verdict_after_fatal():
+    analyzer = OutputAnalyzer()
+    analyzer.feed("Cannot connect to target.\n")
+    analyzer.feed('loadfile "x" 0x0\n')
+    analyzer.feed("O.K.\n")
+    outcome = analyzer.outcome()
+    assert outcome.success is False
+    assert outcome.errors == ["Cannot connect"]
+
+
+# ===== FlashOutcome =====
+
+def test_flash_outcome_normalizes_and_bool():
+    outcome = FlashOutcome(False, None, None, "raw")
+    assert outcome.errors == []
+    assert outcome.warnings == []
+    assert not outcome
+    assert bool(FlashOutcome(True, [], [], cached=True))
+
+
+# ===== file_digest =====
+
+def test_file_digest_matches_hashlib(tmp_path):
+    fw = tmp_path / "app.bin"
+    fw.write_bytes(b"firmware" * 1000)
+    assert FlasherService.file_digest(str(fw)) == hashlib.sha256(b"firmware" * 1000).hexdigest()
+
+
+def test_file_digest_empty_file(tmp_path):
+    fw = tmp_path / "empty.bin"
+    fw.write_bytes(b"")
+    assert FlasherService.file_digest(str(fw)) == hashlib.sha256(b"").hexdigest()
+
+
+# ===== flash-skip cache =====
+
+def test_flash_cache_roundtrip_and_persistence(tmp_path):
+    svc = make_service(tmp_path)
+    assert not svc.is_flash_cached("IO", "RelA", "abc123")
+    svc.record_flash("IO", "RelA", "abc123")
+    assert svc.is_flash_cached("IO", "RelA", "abc123")
+    assert not svc.is_flash_cached("IO", "RelA", "other")
+    assert not svc.is_flash_cached("Delsys", "RelA", "abc123")
+    assert os.path.exists(tmp_path / "flash_cache.json")
+
+    # A fresh service over the same base_dir sees the persisted entry
+    svc2 = make_service(tmp_path)
+    assert svc2.is_flash_cached("IO", "RelA", "abc123")
+
+
+# ===== firmware discovery =====
+
+def test_find_firmware_file_filters_tag_and_extension(tmp_path):
+    rel = tmp_path / "firmware" / "RelA"
+    rel.mkdir(parents=True)
+    (rel / "app_io_v1.bin").write_bytes(b"x")
+    (rel / "app_io_v1.txt").write_bytes(b"x")
+    (rel / "app_logo_v1.bin").write_bytes(b"x")
+    svc = make_service(tmp_path)
+    found = svc.find_firmware_file("RelA", "_io_")
+    assert found is not None and found.endswith("app_io_v1.bin")
+    assert svc.find_firmware_file("RelA", "_delsys_") is None
+    assert svc.find_firmware_file("NoSuchFolder", "_io_") is None
+
+
+def test_list_local_folders_skips_junk_dirs(tmp_path):
+    root = tmp_path / "firmware"
+    for name in ("RelA", "RelB", "__pycache__", ".git", "_private"):
+        (root / name).mkdir(parents=True)
+    svc = make_service(tmp_path)
+    assert sorted(svc.list_local_folders()) == ["RelA", "RelB"]